@@ -1,24 +1,148 @@
+import itertools
 import os
-from flask import Flask, render_template, request, render_template_string, url_for, send_file
-from modules.preprocess import load_csv, get_mobility_states
-from modules.visuals import plot_steady_pie, plot_state_timeline, plot_mm1_summary
-from modules.markov_model import (
-    build_transition_matrix,
-    compute_steady_state,
-    compute_recurrence_times,
-    compute_first_passage,
-    compute_absorption
-)
-from modules.hmm_model import forward_algorithm, viterbi_algorithm, compute_hidden_steady_state
-from modules.mm1_queue import mm1_metrics
-import csv
-from fpdf import FPDF
+import threading
+from flask import Flask, render_template, request, render_template_string, url_for, jsonify
+from modules import instrumentation
+from modules.instrumentation import stage
+
+# Heavy dependencies (pandas, matplotlib, FPDF) and the model modules are imported
+# inside the routes that need them, so importing this module stays cheap.
 
 app = Flask(__name__)
+instrumentation.init_app(app)  # Server-Timing headers, /metrics, ?profile=
+
+# 🔹 Global Data (loaded on first use)
+DATA_PATH = os.environ.get('MOBILITY_DATA_PATH', 'data/Global_Mobility_Report.csv')
+GLOBAL_DATA = None
+_DATA_LOCK = threading.Lock()
+_WARMUP_THREAD = None
+_WARMUP_LOCK = threading.Lock()
+
+
+def load_global_data():
+    """
+    Loads the mobility dataset into GLOBAL_DATA on first call (once per process).
+    Safe to call concurrently from requests and the warm-up thread.
+
+    Returns:
+        pd.DataFrame: The loaded dataset.
+    """
+    global GLOBAL_DATA
+    if GLOBAL_DATA is None:
+        with _DATA_LOCK:
+            if GLOBAL_DATA is None:
+                from modules.preprocess import load_csv
+                GLOBAL_DATA = load_csv(DATA_PATH)
+    return GLOBAL_DATA
+
+
+def _warm_up():
+    try:
+        import modules.visuals  # noqa: F401  (pulls in matplotlib)
+        import fpdf  # noqa: F401
+        load_global_data()
+    except Exception:
+        app.logger.exception("Background warm-up failed; data will load on first use")
+
+
+def start_warmup():
+    """
+    Starts a daemon thread that imports the heavy modules and loads the dataset,
+    so the first /markov request does not pay for it. Routes that don't need the
+    data respond immediately in the meantime. Only one thread is ever started
+    per process; later calls return it.
+
+    Returns:
+        threading.Thread: The warm-up thread.
+    """
+    global _WARMUP_THREAD
+    with _WARMUP_LOCK:
+        if _WARMUP_THREAD is None:
+            _WARMUP_THREAD = threading.Thread(target=_warm_up, name='data-warmup', daemon=True)
+            _WARMUP_THREAD.start()
+    return _WARMUP_THREAD
+
+
+def create_app():
+    """
+    WSGI app factory. Loads the dataset before returning the app so that, with
+    gunicorn's preload_app, it is read once in the master and shared copy-on-write
+    with every forked worker.
+
+    Returns:
+        Flask: The configured application.
+    """
+    load_global_data()
+    return app
+
+
+if os.environ.get('MOBILITY_WARMUP') == '1':
+    start_warmup()
+
+
+def timeline_selection(values):
+    """
+    Reads a timeline selection from form fields or query parameters.
+
+    Args:
+        values (MultiDict): request.form or request.args with 'country', 'year',
+            'category' and optionally 'sub_region_1' / 'sub_region_2' or 'metro_area'.
+
+    Returns:
+        tuple: (region key, year, category)
+    """
+    from modules.preprocess import region_key
+
+    region = region_key((values['country'],
+                         values.get('sub_region_1', '').strip() or None,
+                         values.get('sub_region_2', '').strip() or None,
+                         values.get('metro_area', '').strip() or None))
+    return region, int(values['year']), values['category']
+
+
+def load_timeline(region, year, category):
+    """
+    Builds the daily Low/Moderate/High state sequence of one region and year.
+
+    Returns:
+        list of str: The state sequence.
+    """
+    from modules.preprocess import filter_mobility, categorize_states, region_label
+
+    with stage('load'):
+        df = load_global_data()
+    with stage('filter'):
+        values = filter_mobility(df, region, year, category)
+    with stage('categorize'):
+        sequence = categorize_states(values).dropna().tolist()
+    if not sequence:
+        raise ValueError(f"No {category} data for {region_label(region)} in {year}.")
+    return sequence
+
+
+def timeline_summary(steady, place, year, category):
+    """
+    Returns:
+        str: One-paragraph summary naming the dominant steady state.
+    """
+    dominant_state = max(steady, key=steady.get)
+    return f"In {year}, the most stable mobility behavior in {place} was '{dominant_state}'. " \
+           f"This means people mostly showed '{dominant_state.lower()}' activity in the category '{category}'."
+
+
+# 🔹 Health & Readiness Probes
+@app.route('/healthz')
+def healthz():
+    return jsonify(status='ok')
+
+
+@app.route('/readyz')
+def readyz():
+    if GLOBAL_DATA is None:
+        start_warmup()  # No-op if warm-up is already running or finished
+        return jsonify(status='loading'), 503
+    return jsonify(status='ready', rows=len(GLOBAL_DATA), pid=os.getpid())
 
-# 🔹 Load Global Data on Startup
-DATA_PATH = 'data/Global_Mobility_Report.csv'
-GLOBAL_DATA = load_csv(DATA_PATH)
 
 # 🔹 Home Route
 @app.route('/')
@@ -31,60 +155,114 @@ def index():
 def markov():
     if request.method == 'POST':
         # Step 1: Get user input
-        country = request.form['country']
-        year = int(request.form['year'])
-        category = request.form['category']
-
+        from modules.preprocess import region_label
+        from modules.visuals import plot_steady_pie, plot_state_timeline
+        from modules.markov_model import (
+            build_transition_matrix,
+            compute_steady_state,
+            compute_recurrence_times,
+            compute_first_passage,
+            compute_absorption
+        )
         try:
-            sequence = get_mobility_states(GLOBAL_DATA, country, year, category)
+            region, year, category = timeline_selection(request.form)
+            sequence = load_timeline(region, year, category)
         except Exception as e:
             return render_template('markov.html', error=str(e))
+        place = region_label(region)
 
         # Step 2: Run Markov Model computations
-        matrix, order = build_transition_matrix(sequence)
-        steady_raw = compute_steady_state(matrix)
-        steady = {order[i]: steady_raw[i] for i in range(len(order))}
-        recurrence = compute_recurrence_times(steady_raw, order)
-        passage = compute_first_passage(matrix, order)
-        absorption = compute_absorption(matrix, order)
+        with stage('matrix'):
+            matrix, order = build_transition_matrix(sequence)
+        with stage('steady'):
+            steady_raw = compute_steady_state(matrix)
+            steady = {order[i]: steady_raw[i] for i in range(len(order))}
+            recurrence = compute_recurrence_times(steady_raw, order)
+        with stage('passage'):
+            passage = compute_first_passage(matrix, order)
+        with stage('absorption'):
+            absorption = compute_absorption(matrix, order)
+
+        # Optional: resampling-based confidence intervals
+        intervals = None
+        if request.form.get('bootstrap'):
+            from modules.markov_batch import bootstrap_markov, MAX_RESAMPLES
+            raw = request.form.get('n_resamples') or '2000'
+            try:
+                n_resamples = int(raw)
+            except ValueError:
+                n_resamples = None
+            if n_resamples is None or not 1 <= n_resamples <= MAX_RESAMPLES:
+                return render_template('markov.html',
+                                       error=f"Number of resamples must be a whole number between 1 and {MAX_RESAMPLES}.")
+            try:
+                # workers=1: gunicorn already runs one process per core
+                with stage('bootstrap'):
+                    intervals = bootstrap_markov(sequence, order,
+                                                 n_resamples=n_resamples,
+                                                 method=request.form.get('resample_method', 'block'),
+                                                 workers=1)
+            except ValueError as e:
+                return render_template('markov.html', error=str(e))
+
+        # Regime change points in the transition dynamics
+        from modules.preprocess import STATE_LABELS
+        from modules.markov_batch import encode_states
+        from modules.changepoint import detect_changepoints
+        codes, _ = encode_states(sequence, STATE_LABELS)
+        with stage('changepoint'):
+            breakpoints = detect_changepoints(codes, len(STATE_LABELS))
+
+        # Optional: time-varying transition matrices over sliding windows
+        rolling = None
+        window = request.form.get('window', type=int)
+        if window:
+            from modules.markov_batch import rolling_markov
+            try:
+                with stage('rolling'):
+                    rolling = rolling_markov(codes, len(STATE_LABELS), window,
+                                             request.form.get('step', 1, type=int))
+            except ValueError as e:
+                return render_template('markov.html', error=str(e))
 
         # Step 3: Save charts & timeline
         img_dir = 'static/plots'
         os.makedirs(img_dir, exist_ok=True)
         pie_path = os.path.join(img_dir, 'steady_pie.png')
         line_path = os.path.join(img_dir, 'state_line.png')
-        plot_steady_pie(list(steady.values()), list(steady.keys()), pie_path)
+        drift_path = os.path.join(img_dir, 'steady_drift.png')
+        with stage('plot_pie'):
+            plot_steady_pie(list(steady.values()), list(steady.keys()), pie_path)
+        if rolling is not None:
+            from modules.visuals import plot_steady_drift
+            with stage('plot_drift'):
+                plot_steady_drift(rolling['starts'], rolling['steady'], STATE_LABELS, drift_path, window)
 
         # Step 4: Summary generation
-        dominant_state = max(steady, key=steady.get)
-        summary = f"In {year}, the most stable mobility behavior in {country} was '{dominant_state}'. " \
-                  f"This means people mostly showed '{dominant_state.lower()}' activity in the category '{category}'."
-
-        # Step 5: Save timeline chart + CSV + PDF
-        timeline_csv = os.path.join(img_dir, 'timeline.csv')
-        timeline_pdf = os.path.join(img_dir, 'timeline_report.pdf')
-        plot_state_timeline(sequence, line_path, csv_path=timeline_csv)
-
-        # Export timeline summary as PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Mobility Timeline Report", ln=True, align='C')
-        pdf.ln(10)
-        pdf.multi_cell(0, 8, txt=summary)
-        pdf.image(line_path, x=10, y=pdf.get_y() + 5, w=190)
-        pdf.output(timeline_pdf)
+        summary = timeline_summary(steady, place, year, category)
+
+        # Step 5: Save timeline chart
+        with stage('plot_timeline'):
+            plot_state_timeline(sequence, line_path, breakpoints=breakpoints)
+
+        # The downloads rebuild the timeline from the selection in their URL
+        selection = {'country': region[0], 'sub_region_1': region[1], 'sub_region_2': region[2],
+                     'metro_area': region[3], 'year': year, 'category': category}
 
         # Step 6: Render result
         html_block = render_template_string("""
             <h3>State Order:</h3>
             <p>{{ order }}</p>
 
+            {% if intervals %}
+            <p><em>Intervals: {{ intervals.ci }}% percentile, {{ intervals.n_resamples }} {{ intervals.method }} resamples.</em></p>
+            {% endif %}
+
             <h3>Steady State:</h3>
-            <ul>{% for k, v in steady.items() %}<li>{{ k }}: {{ v }}</li>{% endfor %}</ul>
+            <ul>{% for k, v in steady.items() %}<li>{{ k }}: {{ v }}{% if intervals %} [{{ intervals.steady[k][0] }}, {{ intervals.steady[k][1] }}]{% endif %}</li>{% endfor %}</ul>
 
             <h3>Recurrence Time:</h3>
-            <ul>{% for k, v in recurrence.items() %}<li>{{ k }}: {{ v }}</li>{% endfor %}</ul>
+            <ul>{% for k, v in recurrence.items() %}<li>{{ k }}: {{ v }}{% if intervals %} [{{ intervals.recurrence[k][0] }}, {{ intervals.recurrence[k][1] }}]{% endif %}</li>{% endfor %}</ul>
 
             <h3>First Passage Time:</h3>
             <ul>
@@ -92,13 +270,20 @@ def markov():
                 <li><strong>{{ i }} →</strong>
                     <ul>
                     {% for j, val in row.items() %}
-                        <li>{{ j }}: {{ val }}</li>
+                        <li>{{ j }}: {{ val }}{% if intervals %} [{{ intervals.passage[i][j][0] }}, {{ intervals.passage[i][j][1] }}]{% endif %}</li>
                     {% endfor %}
                     </ul>
                 </li>
             {% endfor %}
             </ul>
 
+            <h3>Regime Change Points:</h3>
+            {% if breakpoints %}
+            <ul>{% for day in breakpoints %}<li>Day {{ day }}</li>{% endfor %}</ul>
+            {% else %}
+            <p>No significant shift in transition dynamics.</p>
+            {% endif %}
+
             {% if absorption %}
             <h3>Absorption Times:</h3>
             <ul>
@@ -107,51 +292,233 @@ def markov():
             {% endfor %}
             </ul>
             {% endif %}
-        """, order=order, steady=steady, recurrence=recurrence, passage=passage, absorption=absorption)
+        """, order=order, steady=steady, recurrence=recurrence, passage=passage, absorption=absorption, intervals=intervals, breakpoints=breakpoints)
 
         return render_template("result.html",
-                               title=f"{country} Mobility Analysis ({year})",
+                               title=f"{place} Mobility Analysis ({year})",
                                subtitle=f"Category: {category}",
                                content=html_block,
                                back_url=url_for('markov'),
                                pie_chart_url='/' + pie_path,
                                line_chart_url='/' + line_path,
-                               summary_text=summary)
+                               drift_chart_url='/' + drift_path if rolling is not None else None,
+                               summary_text=summary,
+                               selection=selection)
 
     return render_template('markov.html')
 
 
+# 🔹 Markov Timeline Downloads
+# Each link carries the selection (country, sub-regions, year, category), so any
+# worker can serve it and concurrent users never see each other's timelines.
+@app.route('/markov/download/csv')
+def download_timeline_csv():
+    from modules.reports import csv_response
+
+    try:
+        sequence = load_timeline(*timeline_selection(request.args))
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    return csv_response(enumerate(sequence), 'timeline.csv', header=["Day", "State"])
+
+
+@app.route('/markov/download/pdf')
+def download_timeline_pdf():
+    import tempfile
+    from fpdf import FPDF
+    from modules.preprocess import STATE_LABELS, region_label
+    from modules.markov_model import build_transition_matrix, compute_steady_state
+    from modules.markov_batch import encode_states
+    from modules.changepoint import detect_changepoints
+    from modules.visuals import plot_state_timeline
+    from modules.reports import pdf_response
+
+    try:
+        region, year, category = timeline_selection(request.args)
+        sequence = load_timeline(region, year, category)
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+    with stage('matrix'):
+        matrix, order = build_transition_matrix(sequence)
+    with stage('steady'):
+        steady_raw = compute_steady_state(matrix)
+        steady = {order[i]: steady_raw[i] for i in range(len(order))}
+    summary = timeline_summary(steady, region_label(region), year, category)
+    codes, _ = encode_states(sequence, STATE_LABELS)
+    with stage('changepoint'):
+        breakpoints = detect_changepoints(codes, len(STATE_LABELS))
+
+    # FPDF embeds images from a path, so draw the chart into a private temp file
+    fd, chart_path = tempfile.mkstemp(suffix='.png')
+    os.close(fd)
+    try:
+        with stage('plot_timeline'):
+            plot_state_timeline(sequence, chart_path, breakpoints=breakpoints)
+        with stage('pdf'):
+            pdf = FPDF()
+            pdf.add_page()
+            pdf.set_font("Arial", size=12)
+            pdf.cell(200, 10, txt="Mobility Timeline Report", ln=True, align='C')
+            pdf.ln(10)
+            pdf.multi_cell(0, 8, txt=summary)
+            pdf.image(chart_path, x=10, y=pdf.get_y() + 5, w=190)
+            response = pdf_response(pdf, 'timeline_report.pdf')
+    finally:
+        os.remove(chart_path)
+    return response
+
+
+@app.route('/markov/download/states')
+def download_states_csv():
+    """
+    Streams categorized daily states for the regions of several countries, e.g.
+    /markov/download/states?country=Pakistan&country=India&category=...&year=2021&level=sub_region_1
+    """
+    from modules.preprocess import iter_state_rows
+    from modules.reports import csv_response
+
+    countries = request.args.getlist('country')
+    category = request.args.get('category', 'retail_and_recreation_percent_change_from_baseline')
+    year = request.args.get('year')
+    level = request.args.get('level', 'country')
+    try:
+        if year is not None:
+            try:
+                year = int(year)
+            except ValueError:
+                raise ValueError(f"Year must be a whole number, got '{year}'.")
+        rows = iter_state_rows(load_global_data(), countries, category, year, level)
+        first = next(rows, None)  # Surface bad parameters before streaming starts
+    except (KeyError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    if first is not None:
+        rows = itertools.chain([first], rows)
+    return csv_response(rows, 'mobility_states.csv', header=["Region", "Date", category, "State"])
+
+
+# 🔹 Multi-Region Comparison Route
+@app.route('/compare', methods=['GET', 'POST'])
+def compare():
+    if request.method == 'POST':
+        # Step 1: Get user input (form fields or a JSON body)
+        payload = request.get_json(silent=True) or request.form
+        countries = payload.get('countries', [])
+        if isinstance(countries, str):
+            countries = [c.strip() for c in countries.split(',') if c.strip()]
+        category = payload.get('category', 'retail_and_recreation_percent_change_from_baseline')
+        level = payload.get('level', 'country')
+
+        from modules.preprocess import extract_region_sequences, region_label, STATE_LABELS
+        from modules.markov_batch import compare_chains, summarize_comparison
+        from modules.changepoint import detect_changepoints_batch
+
+        try:
+            start_year = int(payload.get('start_year', 2020))
+            end_year = int(payload.get('end_year') or start_year)
+            if not countries:
+                raise ValueError("Enter at least one country.")
+            if start_year > end_year:
+                raise ValueError(f"Start year {start_year} is after end year {end_year}.")
+            with stage('load'):
+                df = load_global_data()
+            if not category.endswith('_percent_change_from_baseline') or category not in df.columns:
+                raise ValueError(f"Unknown mobility category '{category}'.")
+            with stage('filter'):
+                keyed = extract_region_sequences(df, category, start_year, end_year,
+                                                 level=level, countries=countries)
+            sequences = {region_label(key): codes for key, codes in keyed.items()}
+        except Exception as e:
+            if request.is_json:
+                return jsonify(error=str(e)), 400
+            return render_template('compare.html', error=str(e))
+
+        # Step 2: Fit and evaluate every region's chain in one batch
+        with stage('compare'):
+            rows = summarize_comparison(compare_chains(sequences, STATE_LABELS), STATE_LABELS)
+        with stage('changepoint'):
+            breakpoints = detect_changepoints_batch(sequences, len(STATE_LABELS))
+        for row in rows:
+            row['changepoints'] = breakpoints[row['region']]
+        found = {key[0] for key in keyed}
+        missing = [c for c in countries if c not in found]
+
+        if request.is_json:
+            return jsonify(states=STATE_LABELS, regions=rows, missing=missing)
+        return render_template('compare.html',
+                               rows=rows,
+                               states=STATE_LABELS,
+                               missing=missing,
+                               category=category,
+                               level=level,
+                               start_year=start_year,
+                               end_year=end_year)
+
+    return render_template('compare.html')
+
+
 # 🔹 Hidden Markov Model Route
+HMM_STATES = ['Strict Policy', 'Moderate Policy', 'Normal Mobility']
+HMM_OBSERVATIONS = ['Low Mobility', 'Moderate Mobility', 'High Mobility']
+HMM_START_DEFAULTS = {'Strict Policy': 0.5, 'Moderate Policy': 0.3, 'Normal Mobility': 0.2}
+
+
+def hmm_parameters(values):
+    """
+    Reads an HMM run (observations and model parameters) from form fields or
+    query parameters, using the field names of the /hmm form.
+
+    Args:
+        values (MultiDict): request.form or request.args.
+
+    Returns:
+        tuple: (observation list, start_prob, trans_prob, emit_prob)
+
+    Raises:
+        ValueError: If there are no observations or a probability is not a number.
+    """
+    obs_seq = [x.strip() for x in values.get('obs_seq', '').split(',') if x.strip()]
+    if not obs_seq:
+        raise ValueError("The observation sequence is empty.")
+
+    start_prob = {state: float(values.get(f'start_prob[{state}]', HMM_START_DEFAULTS[state]))
+                  for state in HMM_STATES}
+    trans_prob = {state: {to_state: float(values.get(f'trans[{state}][{to_state}]', 0.33))
+                          for to_state in HMM_STATES}
+                  for state in HMM_STATES}
+    emit_prob = {state: {obs: float(values.get(f'emit[{state}][{obs}]', 0.33))
+                         for obs in HMM_OBSERVATIONS}
+                 for state in HMM_STATES}
+    return obs_seq, start_prob, trans_prob, emit_prob
+
+
+def hmm_query(obs_seq, start_prob, trans_prob, emit_prob):
+    """
+    Returns:
+        dict: The run as /hmm form fields, for the download links' query string.
+    """
+    query = {'obs_seq': ','.join(obs_seq)}
+    for state in HMM_STATES:
+        query[f'start_prob[{state}]'] = start_prob[state]
+        for to_state in HMM_STATES:
+            query[f'trans[{state}][{to_state}]'] = trans_prob[state][to_state]
+        for obs in HMM_OBSERVATIONS:
+            query[f'emit[{state}][{obs}]'] = emit_prob[state][obs]
+    return query
+
+
 @app.route('/hmm', methods=['GET', 'POST'])
 def hmm():
-    default_states = ['Strict Policy', 'Moderate Policy', 'Normal Mobility']
-    
     if request.method == 'POST':
-        # Step 1: Parse inputs
-        obs_str = request.form.get('obs_seq', '')
-        obs_seq = [x.strip() for x in obs_str.split(',') if x.strip()]
-
-        # Step 2: Extract start, transition, and emission probabilities
-        start_prob = {
-            'Strict Policy': float(request.form.get('start_prob[Strict Policy]', 0.5)),
-            'Moderate Policy': float(request.form.get('start_prob[Moderate Policy]', 0.3)),
-            'Normal Mobility': float(request.form.get('start_prob[Normal Mobility]', 0.2))
-        }
-
-        default_trans = {}
-        default_emit = {}
-        for state in default_states:
-            default_trans[state] = {}
-            default_emit[state] = {}
-            for to_state in default_states:
-                default_trans[state][to_state] = float(request.form.get(f'trans[{state}][{to_state}]', 0.33))
-            for obs in ['Low Mobility', 'Moderate Mobility', 'High Mobility']:
-                default_emit[state][obs] = float(request.form.get(f'emit[{state}][{obs}]', 0.33))
+        from modules.hmm_model import forward_algorithm, viterbi_algorithm, compute_hidden_steady_state
+
+        # Step 1-2: Parse the observations and the start, transition and emission probabilities
+        obs_seq, start_prob, default_trans, default_emit = hmm_parameters(request.form)
 
         # Step 3: Run HMM algorithms
-        forward_prob = forward_algorithm(obs_seq, default_states, start_prob, default_trans, default_emit)
-        viterbi_path = viterbi_algorithm(obs_seq, default_states, start_prob, default_trans, default_emit)
-        steady_hidden = compute_hidden_steady_state(default_states, default_trans)
+        forward_prob = forward_algorithm(obs_seq, HMM_STATES, start_prob, default_trans, default_emit)
+        viterbi_path = viterbi_algorithm(obs_seq, HMM_STATES, start_prob, default_trans, default_emit)
+        steady_hidden = compute_hidden_steady_state(HMM_STATES, default_trans)
 
         # Step 4: Save charts
         img_dir = 'static/plots'
@@ -163,17 +530,14 @@ def hmm():
         plot_viterbi_path(viterbi_path, viterbi_path_img)
         plot_hidden_steady_pie(steady_hidden, steady_pie_img)
 
-        # Store for download use
-        app.config["last_viterbi_path"] = viterbi_path
-        app.config["last_steady_hidden"] = steady_hidden
-
         return render_template('hmm.html',
                                forward_prob=round(forward_prob, 6),
                                viterbi_path=viterbi_path,
                                steady_hidden=steady_hidden,
                                selected_obs=obs_seq,
                                viterbi_chart_url='/' + viterbi_path_img,
-                               steady_chart_url='/' + steady_pie_img)
+                               steady_chart_url='/' + steady_pie_img,
+                               download_args=hmm_query(obs_seq, start_prob, default_trans, default_emit))
 
     return render_template('hmm.html',
                            forward_prob=None,
@@ -183,55 +547,92 @@ def hmm():
 
 
 # 🔹 HMM Report Downloads
+# Like the timeline downloads, each link carries the whole run (observations and
+# probabilities) and the report is recomputed from it on request.
 @app.route('/hmm/download/pdf')
 def download_hmm_pdf():
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.set_title("HMM Report")
-
-    pdf.cell(200, 10, txt="COVID-19 Mobility - HMM Report", ln=True, align='C')
-    pdf.ln(10)
-
-    pdf.cell(200, 10, txt="Most Likely Policy Path (Viterbi):", ln=True)
-    for i, state in enumerate(app.config.get("last_viterbi_path", []), start=1):
-        pdf.cell(200, 10, txt=f"Day {i}: {state}", ln=True)
-
-    pdf.ln(5)
-    pdf.cell(200, 10, txt="Steady-State Distribution:", ln=True)
-    for state, prob in app.config.get("last_steady_hidden", {}).items():
-        pdf.cell(200, 10, txt=f"{state}: {prob:.4f}", ln=True)
-
-    if os.path.exists("static/plots/viterbi_path.png"):
-        pdf.image("static/plots/viterbi_path.png", x=10, y=pdf.get_y() + 10, w=90)
-    if os.path.exists("static/plots/hidden_steady_pie.png"):
-        pdf.image("static/plots/hidden_steady_pie.png", x=110, y=pdf.get_y(), w=90)
-
-    pdf.output("static/plots/hmm_report.pdf")
-    return send_file("static/plots/hmm_report.pdf", as_attachment=True)
+    import tempfile
+    from fpdf import FPDF
+    from modules.hmm_model import forward_algorithm, viterbi_algorithm, compute_hidden_steady_state
+    from modules.visuals import plot_viterbi_path, plot_hidden_steady_pie
+    from modules.reports import pdf_response
+
+    try:
+        obs_seq, start_prob, trans_prob, emit_prob = hmm_parameters(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    forward_prob = forward_algorithm(obs_seq, HMM_STATES, start_prob, trans_prob, emit_prob)
+    viterbi_path = viterbi_algorithm(obs_seq, HMM_STATES, start_prob, trans_prob, emit_prob)
+    steady_hidden = compute_hidden_steady_state(HMM_STATES, trans_prob)
+
+    # FPDF embeds images from a path, so draw the charts into private temp files
+    chart_paths = []
+    for _ in range(2):
+        fd, path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        chart_paths.append(path)
+    viterbi_img, pie_img = chart_paths
+    try:
+        plot_viterbi_path(viterbi_path, viterbi_img)
+        plot_hidden_steady_pie(steady_hidden, pie_img)
+        with stage('pdf'):
+            pdf = FPDF()
+            pdf.add_page()
+            pdf.set_font("Arial", size=12)
+            pdf.set_title("HMM Report")
+
+            pdf.cell(200, 10, txt="COVID-19 Mobility - HMM Report", ln=True, align='C')
+            pdf.ln(10)
+
+            pdf.cell(200, 10, txt=f"Likelihood of observed sequence (Forward): {round(forward_prob, 6)}", ln=True)
+            pdf.ln(5)
+
+            pdf.cell(200, 10, txt="Most Likely Policy Path (Viterbi):", ln=True)
+            for i, state in enumerate(viterbi_path, start=1):
+                pdf.cell(200, 10, txt=f"Day {i}: {state}", ln=True)
+
+            pdf.ln(5)
+            pdf.cell(200, 10, txt="Steady-State Distribution:", ln=True)
+            for state, prob in steady_hidden.items():
+                pdf.cell(200, 10, txt=f"{state}: {prob:.4f}", ln=True)
+
+            pdf.image(viterbi_img, x=10, y=pdf.get_y() + 10, w=90)
+            pdf.image(pie_img, x=110, y=pdf.get_y(), w=90)
+            response = pdf_response(pdf, 'hmm_report.pdf')
+    finally:
+        for path in chart_paths:
+            os.remove(path)
+    return response
 
 
 @app.route('/hmm/download/csv')
 def download_hmm_csv():
-    filepath = "static/plots/hmm_report.csv"
-    with open(filepath, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Day", "Viterbi State"])
-        for i, state in enumerate(app.config.get("last_viterbi_path", []), start=1):
-            writer.writerow([i, state])
+    from modules.hmm_model import viterbi_algorithm, compute_hidden_steady_state
+    from modules.reports import csv_response
 
-        writer.writerow([])
-        writer.writerow(["State", "Steady Probability"])
-        for state, prob in app.config.get("last_steady_hidden", {}).items():
-            writer.writerow([state, prob])
+    try:
+        obs_seq, start_prob, trans_prob, emit_prob = hmm_parameters(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    viterbi_path = viterbi_algorithm(obs_seq, HMM_STATES, start_prob, trans_prob, emit_prob)
+    steady_hidden = compute_hidden_steady_state(HMM_STATES, trans_prob)
 
-    return send_file(filepath, as_attachment=True)
+    def rows():
+        yield from enumerate(viterbi_path, start=1)
+        yield []
+        yield ["State", "Steady Probability"]
+        yield from steady_hidden.items()
+
+    return csv_response(rows(), 'hmm_report.csv', header=["Day", "Viterbi State"])
 
 
 # 🔹 Queueing Theory Route (M/M/1)
 @app.route('/queue', methods=['GET', 'POST'])
 def queue():
     if request.method == 'POST':
+        from modules.mm1_queue import mm1_metrics
+        from modules.visuals import plot_mm1_summary
+
         try:
             arrival = float(request.form['arrival'])
             service = float(request.form['service'])
@@ -0,0 +1,31 @@
+import gc
+import multiprocessing
+import os
+
+# ----------------------------
+# Gunicorn configuration for the mobility dashboard
+# ----------------------------
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# matplotlib's pyplot state is not thread-safe, so scale with processes, not threads
+threads = 1
+worker_class = 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Import wsgi.py (and load the dataset) once in the master; workers are forked
+# afterwards and share the DataFrame pages copy-on-write.
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """
+    Runs in the master after the app has been preloaded. Moving every loaded object
+    into the permanent GC generation keeps the collector from touching (and thereby
+    copying) the shared pages in each worker.
+    """
+    gc.freeze()
+    server.log.info("Dataset preloaded; forking %s workers", workers)
@@ -0,0 +1,97 @@
+import numpy as np
+
+from modules.markov_batch import transition_prefix_counts
+
+# ------------------------------
+# Maximized Markov log-likelihood of count tables
+# ------------------------------
+def segment_log_likelihood(counts):
+    """
+    Log-likelihood of transitions under their own maximum-likelihood matrix:
+    Σ N_ij log(N_ij / N_i), with 0 log 0 = 0.
+
+    Args:
+        counts (np.ndarray): (..., n, n) transition counts
+
+    Returns:
+        np.ndarray: (...) log-likelihoods
+    """
+    row = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(counts > 0, counts * np.log(counts / row), 0.0)
+    return terms.sum(axis=(-2, -1))
+
+# ------------------------------
+# Binary-segmentation likelihood-ratio scan
+# ------------------------------
+def detect_changepoints(codes, n, min_size=14, penalty=None, max_breaks=None):
+    """
+    Finds days where the transition dynamics shift, by recursively splitting the
+    sequence at the candidate with the largest likelihood-ratio statistic
+    2 · [LL(left) + LL(right) − LL(whole)]. Every candidate in a segment is
+    scored at once from the prefix-sum table, so each scan is O(length).
+
+    A split is kept only if the statistic exceeds the penalty. The default is the
+    BIC penalty n(n − 1) · log(m) for a segment of m transitions: one extra free
+    transition matrix.
+
+    Args:
+        codes (np.ndarray): Integer state codes of length T
+        n (int): Number of states
+        min_size (int): Minimum number of transitions on each side of a split
+        penalty (float, optional): Fixed threshold for the statistic. Defaults to BIC.
+        max_breaks (int, optional): Stop after this many change points
+
+    Returns:
+        list of int: Sorted day indices at which a new regime starts
+    """
+    cum = transition_prefix_counts(codes, n)
+    m_total = len(cum) - 1
+    breaks = []
+    segments = [(0, m_total)]  # Half-open ranges of transition indices
+
+    while segments:
+        if max_breaks is not None and len(breaks) >= max_breaks:
+            break
+
+        # Score every admissible split of every open segment; take the best one
+        best = None
+        for a, b in segments:
+            ks = np.arange(a + min_size, b - min_size + 1)
+            if len(ks) == 0:
+                continue
+            whole = segment_log_likelihood(cum[b] - cum[a])
+            left = segment_log_likelihood(cum[ks] - cum[a])
+            right = segment_log_likelihood(cum[b] - cum[ks])
+            stats = 2 * (left + right - whole)
+            i = int(np.argmax(stats))
+            threshold = penalty if penalty is not None else n * (n - 1) * np.log(b - a)
+            if stats[i] > threshold and (best is None or stats[i] - threshold > best[0]):
+                best = (stats[i] - threshold, (a, b), int(ks[i]))
+
+        if best is None:
+            break  # No segment has a significant split left
+
+        _, (a, b), k = best
+        breaks.append(k)
+        segments.remove((a, b))
+        segments += [(a, k), (k, b)]
+
+    return sorted(breaks)
+
+# ------------------------------
+# Change points for many regions
+# ------------------------------
+def detect_changepoints_batch(sequences, n, **kwargs):
+    """
+    Runs detect_changepoints for every region.
+
+    Args:
+        sequences (dict): Region → np.ndarray of integer state codes
+        n (int): Number of states
+        **kwargs: Passed on to detect_changepoints
+
+    Returns:
+        dict: Region → sorted list of change-point day indices
+    """
+    return {region: detect_changepoints(codes, n, **kwargs) for region, codes in sequences.items()}
@@ -0,0 +1,161 @@
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ----------------------------
+# Minimal Prometheus-style histogram
+# ----------------------------
+class Histogram:
+    """
+    Cumulative-bucket histogram, rendered in the Prometheus text exposition format.
+    Observations are kept per label value (e.g., one series per pipeline stage).
+    Counts are per process; under gunicorn each worker reports its own series.
+    """
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value → [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.setdefault(label_value, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, series in sorted(self._series.items()):
+                label = f'{self.label}="{value}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-2]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{{{label}}} {series[-2]}')
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram('mobility_stage_duration_seconds',
+                          'Time spent in each analysis pipeline stage.', 'stage')
+REQUEST_SECONDS = Histogram('mobility_request_duration_seconds',
+                            'Total request handling time per endpoint.', 'endpoint')
+
+# ----------------------------
+# Stage timer
+# ----------------------------
+@contextmanager
+def stage(name):
+    """
+    Times a block of work as a named pipeline stage. The duration is added to the
+    stage histogram and, inside a request, to the response's Server-Timing header.
+
+    Args:
+        name (str): Stage name (e.g., 'filter', 'steady', 'pdf').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(name, elapsed)
+        if has_request_context():
+            g.setdefault('stage_timings', []).append((name, elapsed))
+
+
+def render_metrics():
+    """
+    Returns:
+        str: All histograms in the Prometheus text exposition format.
+    """
+    return "\n".join([STAGE_SECONDS.render(), REQUEST_SECONDS.render()]) + "\n"
+
+# ----------------------------
+# Per-request profiling (opt-in)
+# ----------------------------
+def _start_profiler(mode):
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            mode = 'cprofile'  # Fall back to the standard library profiler
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return mode, profiler
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return 'cprofile', profiler
+
+
+def _profile_response(mode, profiler):
+    if mode == 'pyinstrument':
+        profiler.stop()
+        return Response(profiler.output_html(), mimetype='text/html')
+
+    import pstats
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(50)
+    return Response(out.getvalue(), mimetype='text/plain')
+
+# ----------------------------
+# Flask wiring
+# ----------------------------
+def init_app(app):
+    """
+    Registers request timing, Server-Timing headers, the /metrics endpoint and
+    the ?profile= query flag on a Flask app.
+
+    Profiling is only honoured when app.config['PROFILING_ENABLED'] is true
+    (set MOBILITY_PROFILING=1). Then '?profile=1' returns a cProfile report instead
+    of the page, and '?profile=pyinstrument' a pyinstrument report if installed.
+
+    Args:
+        app (Flask): The application to instrument.
+    """
+    app.config.setdefault('PROFILING_ENABLED', os.environ.get('MOBILITY_PROFILING') == '1')
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_start = time.perf_counter()
+        mode = request.args.get('profile')
+        if mode and app.config['PROFILING_ENABLED']:
+            g.profiler = _start_profiler(mode)
+
+    @app.after_request
+    def _record_request_timing(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        REQUEST_SECONDS.observe(request.endpoint or 'unknown', total)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            response = _profile_response(*profiler)
+
+        timings = g.get('stage_timings', [])
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        response.headers['Server-Timing'] = ", ".join(entries)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,492 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Jobs with at least this many resamples are split across a process pool
+PARALLEL_THRESHOLD = 20000
+
+# Upper bound on resamples per call (keeps memory and run time bounded)
+MAX_RESAMPLES = 50000
+
+# Steady-state mass below this (compute_steady_state's 6-decimal precision) counts as never visited
+MIN_STEADY_MASS = 1e-6
+
+# ------------------------------
+# Encode a list of state labels as integer codes
+# ------------------------------
+def encode_states(states, state_order=None):
+    """
+    Converts a sequence of state labels into an integer array.
+
+    Args:
+        states (list): Observed states (e.g., ['Low', 'High', 'Low', ...])
+        state_order (list, optional): Order of unique states. If None, sorted set is used.
+
+    Returns:
+        codes (np.ndarray): Integer code for each observation
+        state_order (list): Order of states corresponding to the codes
+    """
+    if state_order is None:
+        state_order = sorted(set(states))
+
+    state_idx = {s: i for i, s in enumerate(state_order)}
+    codes = np.fromiter((state_idx[s] for s in states), dtype=np.intp, count=len(states))
+    return codes, state_order
+
+# ------------------------------
+# Count transitions for a batch of sequences
+# ------------------------------
+def batch_transition_counts(sequences, n):
+    """
+    Counts a → b transitions for every sequence in a batch in a single bincount.
+
+    Args:
+        sequences (np.ndarray): (B, T) array of integer state codes
+        n (int): Number of states
+
+    Returns:
+        np.ndarray: (B, n, n) transition count tensor
+    """
+    sequences = np.atleast_2d(sequences)
+    B = sequences.shape[0]
+    flat = (np.arange(B)[:, None] * n * n
+            + sequences[:, :-1] * n
+            + sequences[:, 1:])
+    counts = np.bincount(flat.ravel(), minlength=B * n * n)
+    return counts.reshape(B, n, n).astype(float)
+
+# ------------------------------
+# Prefix-sum table of transition counts
+# ------------------------------
+def transition_prefix_counts(codes, n):
+    """
+    Builds cumulative transition counts so the counts of any segment are one subtraction.
+
+    Args:
+        codes (np.ndarray): Integer state codes of length T
+        n (int): Number of states
+
+    Returns:
+        np.ndarray: (T, n, n) array where [k] counts transitions 0..k-1
+                    (transition t goes from day t to day t + 1)
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    onehot = np.zeros((max(len(codes) - 1, 0), n * n))
+    onehot[np.arange(len(onehot)), codes[:-1] * n + codes[1:]] = 1
+    cum = np.vstack([np.zeros((1, n * n)), np.cumsum(onehot, axis=0)])
+    return cum.reshape(-1, n, n)
+
+# ------------------------------
+# Normalize count tensors into transition matrices
+# ------------------------------
+def normalize_counts(counts):
+    """
+    Row-normalizes transition counts, using a self-loop for rows with no transitions
+    (same convention as build_transition_matrix).
+
+    Args:
+        counts (np.ndarray): (..., n, n) transition counts
+
+    Returns:
+        np.ndarray: (..., n, n) row-stochastic transition matrices
+    """
+    n = counts.shape[-1]
+    row_sum = counts.sum(axis=-1, keepdims=True)
+    empty = row_sum == 0
+    matrices = np.divide(counts, row_sum, out=np.zeros_like(counts, dtype=float), where=~empty)
+    return matrices + empty * np.eye(n)
+
+# ------------------------------
+# Steady state for a batch of transition matrices
+# ------------------------------
+def batch_steady_state(matrices, tol=1e-8, max_iter=1000, start=None):
+    """
+    Vectorized form of compute_steady_state: iterates π ← πP for all matrices at once,
+    starting from the uniform distribution.
+
+    Args:
+        matrices (np.ndarray): (B, n, n) transition matrices
+        tol (float): Convergence threshold (L1 change per matrix)
+        max_iter (int): Maximum number of iterations
+        start (np.ndarray, optional): (B, n) initial distributions. Defaults to uniform.
+
+    Returns:
+        np.ndarray: (B, n) steady-state distributions
+    """
+    B, n, _ = matrices.shape
+    prob = np.full((B, n), 1.0 / n) if start is None else np.asarray(start, dtype=float)
+
+    for _ in range(max_iter):
+        new_prob = np.einsum('bi,bij->bj', prob, matrices)
+        diff = np.abs(new_prob - prob).sum(axis=1)
+        prob = new_prob
+        if diff.max() < tol:
+            break  # Every chain converged
+
+    return prob
+
+# ------------------------------
+# Mean first passage times for a batch of transition matrices
+# ------------------------------
+def batch_first_passage(matrices):
+    """
+    Vectorized form of compute_first_passage. For each target j solves
+    (I - Q_j) m = 1, where Q_j is P with row and column j removed.
+
+    Start states that may never reach j (some state reachable from them, without
+    passing through j, cannot reach j) have an infinite expected passage time.
+
+    Args:
+        matrices (np.ndarray): (B, n, n) transition matrices
+
+    Returns:
+        np.ndarray: (B, n, n) array where [b, i, j] = E[steps from i to j];
+                    the diagonal is NaN and unreachable targets are inf
+    """
+    B, n, _ = matrices.shape
+    passage = np.full((B, n, n), np.nan)
+    if n < 2:
+        return passage
+
+    for j in range(n):
+        # Transitive closure of the transition graph with j's outgoing edges cut
+        reach = (matrices > 0) | np.eye(n, dtype=bool)
+        reach[:, j, :] = False
+        reach[:, j, j] = True
+        for _ in range(int(np.ceil(np.log2(n))) + 1):
+            reach = reach | (np.einsum('bik,bkl->bil', reach.astype(np.int8), reach.astype(np.int8)) > 0)
+        hits_j = reach[:, :, j]                                  # (B, n): l can reach j
+        certain = ~(reach & ~hits_j[:, None, :]).any(axis=2)     # (B, n): every reachable l can reach j
+
+        keep = [k for k in range(n) if k != j]
+        ok = certain[:, keep]                                    # (B, n-1)
+        Q = matrices[:, keep][:, :, keep] * ok[:, :, None] * ok[:, None, :]
+        A = np.eye(n - 1) - Q
+        rhs = ok.astype(float)[..., None]
+
+        # Rows for uncertain starts become x = 0 placeholders, so the system is nonsingular
+        m = np.linalg.solve(A, rhs)[..., 0]
+        passage[:, keep, j] = np.where(ok, m, np.inf)
+
+    return passage
+
+# ------------------------------
+# Resampling: moving-block bootstrap of the transition counts
+# ------------------------------
+def block_bootstrap_counts(codes, n, n_resamples, block_size, rng):
+    """
+    Draws moving-block bootstrap replicates of a state sequence and returns their
+    transition counts. Blocks keep consecutive days together so short-range
+    dependence is preserved. Only transitions inside each block are counted:
+    the jump where two resampled blocks meet was never observed.
+
+    Args:
+        codes (np.ndarray): Integer state codes of length T
+        n (int): Number of states
+        n_resamples (int): Number of replicates to draw
+        block_size (int): Length of each block in days
+        rng (np.random.Generator): Random generator
+
+    Returns:
+        np.ndarray: (n_resamples, n, n) transition counts per replicate
+    """
+    T = len(codes)
+    block_size = max(2, min(block_size, T))
+    n_blocks = -(-T // block_size)  # Ceiling division
+    last_size = T - (n_blocks - 1) * block_size
+
+    # Prefix sums of transitions: a block of L days starting at s holds cum[s+L-1] - cum[s]
+    cum = transition_prefix_counts(codes, n)
+    n_starts = T - block_size + 1
+    full_block = cum[block_size - 1:block_size - 1 + n_starts] - cum[:n_starts]
+    last_block = cum[last_size - 1:last_size - 1 + n_starts] - cum[:n_starts]
+
+    # Sum block tables one block position at a time to keep memory at O(n_resamples · n²)
+    starts = rng.integers(0, n_starts, size=(n_resamples, n_blocks))
+    counts = last_block[starts[:, -1]]
+    for b in range(n_blocks - 1):
+        counts = counts + full_block[starts[:, b]]
+    return counts
+
+# ------------------------------
+# Resampling: Dirichlet posterior over transition rows
+# ------------------------------
+def dirichlet_transition_matrices(counts, n_resamples, rng, prior=1.0):
+    """
+    Samples transition matrices from the Dirichlet posterior of each row,
+    Dir(counts[i] + prior), using normalized gamma draws.
+
+    Args:
+        counts (np.ndarray): (n, n) observed transition counts
+        n_resamples (int): Number of matrices to draw
+        rng (np.random.Generator): Random generator
+        prior (float): Symmetric Dirichlet prior concentration
+
+    Returns:
+        np.ndarray: (n_resamples, n, n) sampled transition matrices
+    """
+    alpha = np.asarray(counts, dtype=float) + prior
+    draws = rng.standard_gamma(alpha, size=(n_resamples,) + alpha.shape)
+    return draws / draws.sum(axis=-1, keepdims=True)
+
+# ------------------------------
+# Worker: resample and evaluate one chunk of replicates
+# ------------------------------
+def _resample_chunk(codes, counts, n, n_resamples, method, block_size, prior, seed):
+    """
+    Draws a chunk of replicates and returns their steady states and passage times.
+    Kept at module level so it can be pickled into a process pool.
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'block':
+        matrices = normalize_counts(block_bootstrap_counts(codes, n, n_resamples, block_size, rng))
+    elif method == 'dirichlet':
+        matrices = dirichlet_transition_matrices(counts, n_resamples, rng, prior)
+    else:
+        raise ValueError(f"Unknown resampling method '{method}' (use 'block' or 'dirichlet').")
+
+    return batch_steady_state(matrices), batch_first_passage(matrices)
+
+# ------------------------------
+# Bootstrap confidence intervals for steady state, recurrence and passage times
+# ------------------------------
+def bootstrap_markov(states, state_order=None, n_resamples=2000, method='block',
+                     block_size=None, ci=95, prior=1.0, seed=None, workers=None):
+    """
+    Estimates percentile confidence intervals for the Markov chain summaries by
+    resampling, evaluating all replicates in batched NumPy.
+
+    Args:
+        states (list): Observed state sequence
+        state_order (list, optional): Order of states. If None, sorted set is used.
+        n_resamples (int): Number of bootstrap replicates (1 to MAX_RESAMPLES)
+        method (str): 'block' (moving-block bootstrap) or 'dirichlet' (posterior draws)
+        block_size (int, optional): Block length for 'block'. Defaults to ~T^(1/3).
+        ci (float): Confidence level in percent
+        prior (float): Dirichlet prior concentration for 'dirichlet'
+        seed (int, optional): Seed for reproducible draws
+        workers (int, optional): Process count. Defaults to CPU count for jobs of at
+                                 least PARALLEL_THRESHOLD replicates, otherwise 1.
+
+    Returns:
+        dict: {
+            'steady': state → (low, high),
+            'recurrence': state → (low, high),
+            'passage': state_i → state_j → (low, high),
+            'n_resamples': int, 'method': str, 'ci': float
+        }
+
+    Raises:
+        ValueError: If the sequence is too short or n_resamples is out of range.
+    """
+    if not 1 <= n_resamples <= MAX_RESAMPLES:
+        raise ValueError(f"Number of resamples must be between 1 and {MAX_RESAMPLES}.")
+    if len(states) < 2:
+        raise ValueError("At least two observations are needed to bootstrap transitions.")
+
+    codes, state_order = encode_states(states, state_order)
+    n = len(state_order)
+    counts = batch_transition_counts(codes[None, :], n)[0]
+    if block_size is None:
+        block_size = max(2, round(len(codes) ** (1 / 3)))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n_resamples >= PARALLEL_THRESHOLD else 1
+    workers = max(1, min(workers, n_resamples))
+
+    # Split replicates into chunks with independent random streams
+    sizes = [len(c) for c in np.array_split(np.arange(n_resamples), workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    args = [(codes, counts, n, size, method, block_size, prior, s) for size, s in zip(sizes, seeds)]
+
+    if workers == 1:
+        results = [_resample_chunk(*args[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_resample_chunk, *zip(*args)))
+
+    steady = np.concatenate([r[0] for r in results])
+    passage = np.concatenate([r[1] for r in results])
+    with np.errstate(divide='ignore'):
+        recurrence = np.where(steady > MIN_STEADY_MASS, 1 / steady, np.inf)
+
+    # 'nearest' picks observed replicate values, so infinite times stay inf (not NaN)
+    q = [(100 - ci) / 2, 100 - (100 - ci) / 2]
+    steady_ci = np.percentile(steady, q, axis=0, method='nearest')
+    recurrence_ci = np.percentile(recurrence, q, axis=0, method='nearest')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN diagonal
+        passage_ci = np.nanpercentile(passage, q, axis=0, method='nearest')
+
+    def interval(lo, hi):
+        return (round(float(lo), 4), round(float(hi), 4))
+
+    return {
+        'steady': {state_order[i]: interval(*steady_ci[:, i]) for i in range(n)},
+        'recurrence': {state_order[i]: interval(*recurrence_ci[:, i]) for i in range(n)},
+        'passage': {
+            state_order[i]: {
+                state_order[j]: interval(*passage_ci[:, i, j])
+                for j in range(n) if j != i
+            }
+            for i in range(n)
+        },
+        'n_resamples': n_resamples,
+        'method': method,
+        'ci': ci,
+    }
+
+# ------------------------------
+# Sliding-window (time-varying) transition matrices
+# ------------------------------
+def rolling_markov(codes, n, window=30, step=1):
+    """
+    Fits a transition matrix and steady state for every window of `window` days,
+    advancing `step` days at a time.
+
+    Counts are updated incrementally rather than refit: a running (prefix) sum of
+    one-hot transitions means each window's counts are the previous window's plus
+    the transitions entering it minus those leaving it, i.e. cum[end] - cum[start].
+
+    Args:
+        codes (np.ndarray): Integer state codes of length T
+        n (int): Number of states
+        window (int): Window length in days (>= 2)
+        step (int): Days between consecutive window starts
+
+    Returns:
+        dict: {
+            'starts': (W,) index of each window's first day,
+            'matrices': (W, n, n) transition matrices,
+            'steady': (W, n) steady-state distributions
+        }
+
+    Raises:
+        ValueError: If the window is shorter than 2 days or longer than the sequence.
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    T = len(codes)
+    if window < 2 or step < 1:
+        raise ValueError("Window must be at least 2 days and step at least 1 day.")
+    if T < window:
+        raise ValueError(f"Sequence has {T} days, shorter than the {window}-day window.")
+
+    # cum_trans[k] = transition counts over days 0..k (k transitions)
+    cum_trans = transition_prefix_counts(codes, n)
+
+    # cum_days[k] = occupancy counts over the first k days
+    cum_days = np.vstack([np.zeros((1, n)), np.cumsum(np.eye(n)[codes], axis=0)])
+
+    starts = np.arange(0, T - window + 1, step)
+    counts = cum_trans[starts + window - 1] - cum_trans[starts]
+    visited = (cum_days[starts + window] - cum_days[starts]) > 0
+
+    matrices = normalize_counts(counts)
+    start = visited / visited.sum(axis=1, keepdims=True)
+    return {
+        'starts': starts,
+        'matrices': matrices,
+        'steady': batch_steady_state(matrices, start=start),
+    }
+
+# ------------------------------
+# Side-by-side Markov summaries for many regions
+# ------------------------------
+def compare_chains(sequences, state_order):
+    """
+    Fits one Markov chain per region and evaluates all of them together: transitions
+    are counted with a single bincount over the concatenated sequences, then steady
+    states, recurrence and first passage times are solved as one batch.
+
+    States a region never visits get zero steady-state mass and inf passage times
+    to and from them (see batch_first_passage).
+
+    Args:
+        sequences (dict): Region → np.ndarray of integer state codes
+        state_order (list): State labels for the codes
+
+    Returns:
+        dict: {
+            'regions': list of region names,
+            'matrix': (R, n, n) transition matrices,
+            'steady': (R, n) steady-state distributions,
+            'recurrence': (R, n) mean recurrence times (inf if never visited),
+            'passage': (R, n, n) mean first passage times,
+            'days': (R,) sequence lengths
+        }
+    """
+    regions = list(sequences)
+    n = len(state_order)
+    R = len(regions)
+    lengths = np.array([len(sequences[r]) for r in regions], dtype=np.intp)
+    if R == 0:
+        empty = np.zeros((0, n))
+        return {'regions': [], 'matrix': np.zeros((0, n, n)), 'steady': empty,
+                'recurrence': empty, 'passage': np.zeros((0, n, n)), 'days': lengths}
+
+    codes = np.concatenate([sequences[r] for r in regions])
+    region_id = np.repeat(np.arange(R), lengths)
+
+    # Only count pairs that stay inside one region's sequence
+    same = region_id[:-1] == region_id[1:]
+    flat = region_id[:-1][same] * n * n + codes[:-1][same] * n + codes[1:][same]
+    counts = np.bincount(flat, minlength=R * n * n).reshape(R, n, n).astype(float)
+    matrices = normalize_counts(counts)
+
+    # Start the power iteration on the states each region actually visited
+    visited = np.zeros((R, n))
+    np.add.at(visited, (region_id, codes), 1)
+    start = (visited > 0) / (visited > 0).sum(axis=1, keepdims=True)
+
+    steady = batch_steady_state(matrices, start=start)
+    with np.errstate(divide='ignore'):
+        recurrence = np.where(steady > MIN_STEADY_MASS, 1 / steady, np.inf)
+
+    return {
+        'regions': regions,
+        'matrix': matrices,
+        'steady': steady,
+        'recurrence': recurrence,
+        'passage': batch_first_passage(matrices),
+        'days': lengths,
+    }
+
+# ------------------------------
+# Convert a comparison into plain per-region records
+# ------------------------------
+def summarize_comparison(result, state_order, digits=4):
+    """
+    Flattens the output of compare_chains into JSON-friendly rows.
+
+    Args:
+        result (dict): Output of compare_chains
+        state_order (list): State labels for the codes
+        digits (int): Rounding precision
+
+    Returns:
+        list of dict: One record per region with 'region', 'days', 'steady',
+                      'recurrence' and 'passage' (state_i → state_j → steps).
+                      Infinite or undefined values are None.
+    """
+    def clean(value):
+        return round(float(value), digits) if np.isfinite(value) else None
+
+    n = len(state_order)
+    rows = []
+    for r, region in enumerate(result['regions']):
+        rows.append({
+            'region': region,
+            'days': int(result['days'][r]),
+            'steady': {state_order[i]: clean(result['steady'][r, i]) for i in range(n)},
+            'recurrence': {state_order[i]: clean(result['recurrence'][r, i]) for i in range(n)},
+            'passage': {
+                state_order[i]: {
+                    state_order[j]: clean(result['passage'][r, i, j])
+                    for j in range(n) if j != i
+                }
+                for i in range(n)
+            },
+        })
+    return rows
@@ -127,51 +127,83 @@ def solve_linear(A, b):
 
     return x
 
+# ------------------------------
+# States reachable from a start state
+# ------------------------------
+def reachable_states(matrix, start, stop=None):
+    """
+    Finds every state reachable from start (including start itself).
+
+    Args:
+        matrix (list of lists): Transition matrix
+        start (int): Index of the start state
+        stop (int, optional): State whose outgoing transitions are not followed
+
+    Returns:
+        set: Indices of reachable states
+    """
+    seen = {start}
+    stack = [start]
+    while stack:
+        k = stack.pop()
+        if k == stop:
+            continue
+        for l, p in enumerate(matrix[k]):
+            if p > 0 and l not in seen:
+                seen.add(l)
+                stack.append(l)
+    return seen
+
 # ------------------------------
 # Compute First Passage Time between states
 # ------------------------------
 def compute_first_passage(matrix, state_order):
     """
     Computes expected steps from state i to j (i ≠ j) using linear equations.
+    Start states that may never reach j (e.g. a state seen only on the last day,
+    which gets a self-loop) have an infinite expected passage time.
 
     Args:
         matrix (list of lists): Transition matrix
         state_order (list): Mapping of indices to state names
 
     Returns:
-        dict: Nested dictionary mapping state_i → state_j → E[steps]
+        dict: Nested dictionary mapping state_i → state_j → E[steps] (inf if unreachable)
     """
     n = len(state_order)
     passage = {}
 
     for j in range(n):  # Target state
+        # k reaches j for certain if every state reachable from k can still reach j
+        reaches_j = [j in reachable_states(matrix, k, stop=j) for k in range(n)]
+        certain = [all(reaches_j[l] for l in reachable_states(matrix, k, stop=j)) for k in range(n)]
+
+        A, b = [], []
+        for k in range(n):
+            row = []
+            if k == j or not certain[k]:
+                # Set equation: x_k = 0 (target, or placeholder for an infinite time)
+                row = [0] * n
+                row[k] = 1
+                b.append(0)
+            else:
+                for l in range(n):
+                    if k == l:
+                        row.append(1 - matrix[k][l])
+                    elif l == j:
+                        row.append(0)
+                    else:
+                        row.append(-matrix[k][l])
+                b.append(1)
+            A.append(row)
+
+        x = solve_linear(A, b)
         for i in range(n):  # Start state
             if i == j:
                 continue
-
-            A, b = [], []
-            for k in range(n):
-                row = []
-                if k == j:
-                    # Set equation: x_j = 0
-                    row = [0] * n
-                    row[k] = 1
-                    b.append(0)
-                else:
-                    for l in range(n):
-                        if k == l:
-                            row.append(1)
-                        elif l == j:
-                            row.append(0)
-                        else:
-                            row.append(-matrix[k][l])
-                    b.append(1)
-                A.append(row)
-
-            x = solve_linear([r[:] for r in A], b[:])
             if state_order[i] not in passage:
                 passage[state_order[i]] = {}
-            passage[state_order[i]][state_order[j]] = round(x[i], 4)
+            passage[state_order[i]][state_order[j]] = round(x[i], 4) if certain[i] else float('inf')
 
     return passage
 
@@ -1,5 +1,21 @@
+import numpy as np
 import pandas as pd
 
+# Mobility state labels in code order (code i ↔ STATE_LABELS[i])
+STATE_LABELS = ['Low', 'Moderate', 'High']
+
+# Columns identifying a region. A region key is a tuple in this order, with None
+# for unused levels, e.g. ('United States', 'California', None, None).
+REGION_KEYS = ['country_region', 'sub_region_1', 'sub_region_2', 'metro_area']
+
+# Columns that are set (all others empty) for each granularity
+REGION_LEVELS = {
+    'country': ['country_region'],
+    'sub_region_1': ['country_region', 'sub_region_1'],
+    'sub_region_2': ['country_region', 'sub_region_1', 'sub_region_2'],
+    'metro_area': ['country_region', 'metro_area'],
+}
+
 # ----------------------------
 # Load the CSV and preprocess dates
 # ----------------------------
@@ -32,30 +48,215 @@ def categorize_states(series):
         pd.Series: A categorical Series with values: 'Low', 'Moderate', 'High'
     """
     bins = [-float('inf'), -20, 5, float('inf')]  # Mobility thresholds
-    labels = ['Low', 'Moderate', 'High']          # Category labels
+    labels = STATE_LABELS                          # Category labels
     return pd.cut(series, bins=bins, labels=labels)
 
 # ----------------------------
-# Filter by country/year and convert to mobility states
+# Region keys
+# ----------------------------
+def region_key(region):
+    """
+    Normalizes a region given as a country name or a partial tuple into a full key.
+
+    Args:
+        region (str or tuple): 'Pakistan', ('United States', 'California'), ...
+
+    Returns:
+        tuple: Key with one entry per REGION_KEYS column (None where unused).
+    """
+    if isinstance(region, str):
+        region = (region,)
+    region = tuple(region)
+    return region + (None,) * (len(REGION_KEYS) - len(region))
+
+
+def region_label(key):
+    """
+    Returns:
+        str: Human-readable name of a region key, e.g. 'United States / California'.
+    """
+    return ' / '.join(str(v) for v in region_key(key) if v is not None)
+
+
+def region_mask(df, region):
+    """
+    Selects the rows of exactly one region. Levels left as None must be empty, so a
+    country alone selects its national rows, not every sub-region's.
+
+    Args:
+        df (pd.DataFrame): The loaded mobility DataFrame.
+        region (str or tuple): Country name or region key.
+
+    Returns:
+        pd.Series: Boolean row mask.
+    """
+    mask = pd.Series(True, index=df.index)
+    for col, value in zip(REGION_KEYS, region_key(region)):
+        if col not in df.columns:
+            if value is not None:
+                return mask & False
+            continue
+        mask &= df[col].isna() if value is None else (df[col] == value)
+    return mask
+
+
+def level_mask(df, level):
+    """
+    Selects every row at one granularity (see REGION_LEVELS).
+
+    Args:
+        df (pd.DataFrame): The loaded mobility DataFrame.
+        level (str): 'country', 'sub_region_1', 'sub_region_2' or 'metro_area'.
+
+    Returns:
+        pd.Series: Boolean row mask.
+    """
+    if level not in REGION_LEVELS:
+        raise ValueError(f"Unknown region level '{level}' (use one of {', '.join(REGION_LEVELS)}).")
+    mask = pd.Series(True, index=df.index)
+    for col in REGION_KEYS:
+        if col in df.columns:
+            mask &= df[col].notna() if col in REGION_LEVELS[level] else df[col].isna()
+        elif col in REGION_LEVELS[level]:
+            return mask & False
+    return mask
+
+# ----------------------------
+# Filter rows for one region/year
+# ----------------------------
+def filter_mobility(df, region, year, category):
+    """
+    Selects the non-missing values of one mobility category for a region and year,
+    in date order.
+
+    Args:
+        df (pd.DataFrame): The loaded mobility DataFrame.
+        region (str or tuple): Country name (national rows) or region key.
+        year (int): Year to filter (e.g., 2021).
+        category (str): Column name for mobility type.
+
+    Returns:
+        pd.Series: Numeric mobility values for the selection.
+    """
+    filtered = df[region_mask(df, region) & (df['year'] == year)]
+    filtered = filtered.sort_values('date', kind='stable')
+    return filtered[category].dropna()  # Ensure no missing data
+
+# ----------------------------
+# Filter by region/year and convert to mobility states
 # ----------------------------
 def get_mobility_states(df, country, year, category):
     """
-    Extracts and categorizes mobility data into states for a specific country and year.
+    Extracts and categorizes mobility data into states for a specific region and year.
 
     Args:
         df (pd.DataFrame): The loaded mobility DataFrame.
-        country (str): Country name to filter.
+        country (str or tuple): Country name (national rows) or region key,
+            e.g. ('United States', 'California').
         year (int): Year to filter (e.g., 2021).
         category (str): Column name for mobility type (e.g., 'retail_and_recreation_percent_change_from_baseline').
 
     Returns:
         list: A list of states (Low/Moderate/High) representing daily mobility behavior.
     """
-    filtered = df[(df['country_region'] == country) & (df['year'] == year)]
-    filtered = filtered.dropna(subset=[category])  # Ensure no missing data
-    states = categorize_states(filtered[category]).dropna().tolist()
+    values = filter_mobility(df, country, year, category)
+    states = categorize_states(values).dropna().tolist()
     return states
 
+# ----------------------------
+# Extract state sequences for every region in one grouped pass
+# ----------------------------
+def _level_rows(df, category, start_year, end_year, level, countries):
+    """
+    Returns the rows at one granularity for a year range, sorted by region and date.
+    """
+    if end_year is None:
+        end_year = start_year
+    mask = level_mask(df, level) & df['year'].between(start_year, end_year)
+    if countries is not None:
+        mask &= df['country_region'].isin(countries)
+    keys = REGION_LEVELS[level]
+    part = df.loc[mask, keys + ['date', category]].dropna(subset=[category])
+    return part.sort_values(keys + ['date'], kind='stable'), keys
+
+
+def extract_region_sequences(df, category, start_year, end_year=None, level='country', countries=None):
+    """
+    Categorizes one mobility column for every region at a granularity in a single
+    vectorized pass and splits it into contiguous per-region code arrays, ready for
+    batched Markov/HMM work.
+
+    Args:
+        df (pd.DataFrame): The loaded mobility DataFrame.
+        category (str): Column name for mobility type.
+        start_year (int): First year (inclusive).
+        end_year (int, optional): Last year (inclusive). Defaults to start_year.
+        level (str): 'country', 'sub_region_1', 'sub_region_2' or 'metro_area'.
+        countries (list of str, optional): Restrict to these countries.
+
+    Returns:
+        dict: Region key (see region_key) → np.ndarray of date-ordered state codes
+              (indices into STATE_LABELS). The arrays are views into one buffer.
+    """
+    part, keys = _level_rows(df, category, start_year, end_year, level, countries)
+    codes = categorize_states(part[category]).cat.codes.to_numpy().astype(np.intp)
+    if len(codes) == 0:
+        return {}
+
+    # Rows are sorted by region, so each region is one contiguous run
+    key_values = part[keys].to_numpy()
+    changed = (key_values[1:] != key_values[:-1]).any(axis=1)
+    starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+
+    sequences = {}
+    for begin, chunk in zip(starts, np.split(codes, starts[1:])):
+        named = dict(zip(keys, key_values[begin]))
+        sequences[tuple(named.get(col) for col in REGION_KEYS)] = chunk
+    return sequences
+
+# ----------------------------
+# Stream categorized rows for several regions (exports)
+# ----------------------------
+def iter_state_rows(df, countries, category, year=None, level='country'):
+    """
+    Lazily yields categorized, date-ordered mobility rows for the regions of
+    several countries, one region at a time, so large exports never materialize
+    the full result.
+
+    Args:
+        df (pd.DataFrame): The loaded mobility DataFrame.
+        countries (list of str): Countries to export, in output order.
+        category (str): Column name for mobility type.
+        year (int, optional): Restrict to one year. If None, all years are exported.
+        level (str): Region granularity (see REGION_LEVELS).
+
+    Yields:
+        tuple: (region label, date 'YYYY-MM-DD', value, state)
+    """
+    mask = level_mask(df, level)
+    if year is not None:
+        mask &= df['year'] == year
+    keys = REGION_LEVELS[level]
+    columns = keys + ['date', category]
+
+    def full_key(group):
+        values = group if isinstance(group, tuple) else (group,)
+        named = dict(zip(keys, values))
+        return tuple(named.get(col) for col in REGION_KEYS)
+
+    # One country at a time, copying only the columns the export needs
+    for country in dict.fromkeys(countries):
+        selected = df.loc[mask & (df['country_region'] == country), columns]
+        positions = selected.groupby(keys, sort=True).indices
+        for group in positions:
+            part = selected.iloc[positions[group]]
+            part = part.dropna(subset=[category]).sort_values('date', kind='stable')
+            label = region_label(full_key(group))
+            states = categorize_states(part[category])
+            dates = part['date'].dt.strftime('%Y-%m-%d')
+            for date, value, state in zip(dates, part[category], states):
+                yield label, date, value, state
+
 # ----------------------------
 # Load + extract states in one call (shortcut)
 # ----------------------------
@@ -0,0 +1,122 @@
+import csv
+import io
+import zlib
+
+from flask import Response, request, send_file, stream_with_context
+
+# ----------------------------
+# Generator-based CSV writer
+# ----------------------------
+def iter_csv(rows, header=None):
+    """
+    Serializes rows to CSV text one line at a time, reusing a single small buffer,
+    so arbitrarily long exports run in constant memory.
+
+    Args:
+        rows (iterable): Iterable of row sequences. An empty row writes a blank line.
+        header (list, optional): Column names written first.
+
+    Yields:
+        str: CSV-encoded lines.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    if header:
+        writer.writerow(header)
+        yield flush()
+    for row in rows:
+        writer.writerow(row)
+        yield flush()
+
+# ----------------------------
+# Streaming gzip compression
+# ----------------------------
+def gzip_chunks(chunks, level=6, min_chunk=64 * 1024):
+    """
+    Compresses a stream of text chunks into a gzip stream, emitting output in
+    blocks of roughly min_chunk bytes so the download starts immediately.
+
+    Args:
+        chunks (iterable of str): Text to compress.
+        level (int): zlib compression level.
+        min_chunk (int): Minimum compressed bytes to accumulate before yielding.
+
+    Yields:
+        bytes: gzip-encoded data.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 → gzip container
+    pending = []
+    size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= min_chunk:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+# ----------------------------
+# Flask responses
+# ----------------------------
+def csv_response(rows, filename, header=None):
+    """
+    Streams rows as a CSV attachment (chunked), gzip-encoded when the client accepts it.
+
+    Args:
+        rows (iterable): Row sequences; may be a lazy generator.
+        filename (str): Download file name.
+        header (list, optional): Column names.
+
+    Returns:
+        flask.Response: Streaming response.
+    """
+    body = iter_csv(rows, header)
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip'] > 0:  # Quality 0 means "not acceptable"
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(body), mimetype='text/csv', headers=headers)
+
+
+def pdf_bytes(pdf):
+    """
+    Renders an FPDF document to bytes in memory (works with PyFPDF 1.7 and fpdf2).
+
+    Args:
+        pdf (FPDF): The finished document.
+
+    Returns:
+        bytes: PDF file contents.
+    """
+    out = pdf.output(dest='S')
+    if isinstance(out, str):
+        out = out.encode('latin-1')  # PyFPDF 1.7 returns a latin-1 str
+    return bytes(out)
+
+
+def pdf_response(pdf, filename):
+    """
+    Sends an FPDF document as an attachment without touching the disk.
+
+    Args:
+        pdf (FPDF): The finished document.
+        filename (str): Download file name.
+
+    Returns:
+        flask.Response: The PDF response.
+    """
+    return send_file(io.BytesIO(pdf_bytes(pdf)), mimetype='application/pdf',
+                     as_attachment=True, download_name=filename)
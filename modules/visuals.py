@@ -19,7 +19,7 @@ def plot_steady_pie(steady, labels, out_path):
     plt.savefig(out_path, bbox_inches='tight')
     plt.close()
 
-def plot_state_timeline(sequence, save_path, csv_path=None):
+def plot_state_timeline(sequence, save_path, csv_path=None, breakpoints=None):
     """
     Plots a timeline of observed mobility states and optionally exports as CSV.
 
@@ -27,6 +27,7 @@ def plot_state_timeline(sequence, save_path, csv_path=None):
         sequence (list of str): Sequence of states ('Low', 'Moderate', 'High').
         save_path (str): Path to save timeline plot image.
         csv_path (str): Optional path to save CSV of timeline.
+        breakpoints (list of int): Optional regime change days to mark on the plot.
     """
     import csv
 
@@ -60,6 +61,13 @@ def plot_state_timeline(sequence, save_path, csv_path=None):
         if mapped_states[i] != mapped_states[i - 1]:
             plt.axvline(x[i], color='gray', linestyle=':', alpha=0.2)
 
+    # Detected regime changes
+    for i, day in enumerate(breakpoints or []):
+        plt.axvline(day, color='crimson', linestyle='--', linewidth=1.5,
+                    label='Regime change' if i == 0 else None)
+    if breakpoints:
+        plt.legend(loc='upper right')
+
     plt.yticks([0, 1, 2], y_labels)
     plt.xlabel("Day")
     plt.ylabel("Mobility State")
@@ -126,3 +134,28 @@ def plot_mm1_summary(metrics, out_path):
     plt.savefig(out_path)
     plt.close()
 
+
+def plot_steady_drift(starts, steady, labels, out_path, window=None):
+    """
+    Plots how the steady-state distribution changes across sliding windows.
+
+    Args:
+        starts (list of int): Day index at which each window starts.
+        steady (array-like): (windows, states) steady-state probabilities.
+        labels (list of str): State names for the columns of steady.
+        out_path (str): Path to save chart image.
+        window (int, optional): Window length, shown in the title.
+    """
+    plt.figure(figsize=(12, 4))
+    plt.stackplot(starts, [steady[:, i] for i in range(len(labels))], labels=labels, alpha=0.85)
+    title = "Steady-State Drift"
+    if window:
+        title += f" ({window}-day windows)"
+    plt.title(title)
+    plt.xlabel("Window Start (Day)")
+    plt.ylabel("Probability")
+    plt.ylim(0, 1)
+    plt.legend(loc='upper right')
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
@@ -0,0 +1,48 @@
+import numpy as np
+
+from modules.changepoint import detect_changepoints, detect_changepoints_batch
+
+STICKY = np.array([[0.95, 0.04, 0.01],
+                   [0.03, 0.95, 0.02],
+                   [0.02, 0.03, 0.95]])
+RESTLESS = np.array([[0.2, 0.4, 0.4],
+                     [0.4, 0.2, 0.4],
+                     [0.4, 0.4, 0.2]])
+
+
+def sample_codes(P, days, rng, start=0):
+    """Samples `days` state codes of a Markov chain with transition matrix P."""
+    codes = [start]
+    for _ in range(days - 1):
+        codes.append(rng.choice(len(P), p=P[codes[-1]]))
+    return np.array(codes)
+
+
+def switching_chain(seed):
+    """150 days of a sticky chain followed by 150 days of a restless one."""
+    rng = np.random.default_rng(seed)
+    before = sample_codes(STICKY, 150, rng)
+    after = sample_codes(RESTLESS, 151, rng, start=before[-1])[1:]
+    return np.concatenate([before, after])
+
+
+def test_detects_planted_switch():
+    for seed in range(3):
+        breaks = detect_changepoints(switching_chain(seed), 3)
+        assert len(breaks) == 1
+        assert abs(breaks[0] - 150) <= 5
+
+
+def test_stationary_chain_has_no_changepoints():
+    codes = sample_codes(STICKY, 365, np.random.default_rng(0))
+    assert detect_changepoints(codes, 3) == []
+
+
+def test_batch_runs_each_region_and_respects_max_breaks():
+    sequences = {'switch': switching_chain(0),
+                 'steady': sample_codes(STICKY, 365, np.random.default_rng(1))}
+    assert detect_changepoints_batch(sequences, 3) == {
+        'switch': detect_changepoints(sequences['switch'], 3),
+        'steady': [],
+    }
+    assert detect_changepoints(sequences['switch'], 3, max_breaks=0) == []
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pytest
+
+from modules.markov_batch import (
+    batch_first_passage, bootstrap_markov, compare_chains, encode_states, rolling_markov
+)
+from modules.markov_model import build_transition_matrix, compute_steady_state, compute_first_passage
+
+
+def sticky_chain(days=365, seed=0):
+    """Samples a stationary, strongly self-persistent 3-state chain."""
+    P = np.array([[0.95, 0.04, 0.01],
+                  [0.03, 0.95, 0.02],
+                  [0.02, 0.03, 0.95]])
+    rng = np.random.default_rng(seed)
+    codes = [0]
+    for _ in range(days - 1):
+        codes.append(rng.choice(3, p=P[codes[-1]]))
+    return ['abc'[c] for c in codes]
+
+
+def test_block_bootstrap_intervals_cover_point_estimates():
+    states = sticky_chain()
+    matrix, order = build_transition_matrix(states)
+    steady = compute_steady_state(matrix)
+    passage = compute_first_passage(matrix, order)
+
+    intervals = bootstrap_markov(states, order, n_resamples=2000, method='block', seed=1)
+
+    for i, state in enumerate(order):
+        low, high = intervals['steady'][state]
+        assert low <= steady[i] <= high
+    for start, row in passage.items():
+        for target, point in row.items():
+            low, high = intervals['passage'][start][target]
+            assert low <= point <= high, (start, target, point, low, high)
+
+
+def test_first_passage_is_infinite_when_target_unreachable():
+    # 'High' appears only on the last day, so it gets an absorbing self-loop
+    matrix, order = build_transition_matrix(['Low', 'Low', 'Moderate', 'Low', 'Moderate', 'High'])
+    passage = compute_first_passage(matrix, order)
+
+    assert math.isinf(passage['High']['Low'])
+    assert math.isinf(passage['Moderate']['Low'])
+    assert passage['Low']['High'] == 5.0
+
+    batched = batch_first_passage(np.array(matrix, dtype=float)[None])[0]
+    for i, start in enumerate(order):
+        for j, target in enumerate(order):
+            if i != j:
+                assert math.isclose(passage[start][target], batched[i, j], rel_tol=1e-4)
+
+
+def test_compare_chains_matches_per_region_fits():
+    regions = {
+        'North': sticky_chain(365, seed=2),
+        'South': sticky_chain(200, seed=3),
+        'Island': ['a', 'b', 'a', 'a', 'b', 'b', 'a'],  # Never visits 'c'
+    }
+    order = ['a', 'b', 'c']
+    result = compare_chains({r: encode_states(s, order)[0] for r, s in regions.items()}, order)
+
+    assert result['regions'] == list(regions)
+    for r, states in enumerate(regions.values()):
+        matrix, _ = build_transition_matrix(states, order)
+        # For 'Island' the scalar fit spreads mass onto the self-looping unvisited state
+        steady = compute_steady_state(matrix) if 'c' in states else None
+        passage = compute_first_passage(matrix, order)
+
+        assert np.allclose(result['matrix'][r], matrix)
+        assert result['days'][r] == len(states)
+        if steady is not None:
+            assert np.allclose(result['steady'][r], list(steady.values()), atol=1e-5)
+        for i, start in enumerate(order):
+            for j, target in enumerate(order):
+                if i != j:
+                    assert math.isclose(result['passage'][r, i, j], passage[start][target], rel_tol=1e-3)
+
+    # The unvisited state has no steady-state mass and is never reached
+    assert result['steady'][2, 2] == 0
+    assert math.isinf(result['recurrence'][2, 2])
+    assert math.isinf(result['passage'][2, 0, 2])
+
+
+def test_rolling_markov_matches_refit_per_window():
+    states = sticky_chain()
+    order = ['a', 'b', 'c']
+    codes, _ = encode_states(states, order)
+    window, step = 60, 15
+
+    result = rolling_markov(codes, len(order), window, step)
+
+    assert list(result['starts']) == list(range(0, len(states) - window + 1, step))
+    for w, start in enumerate(result['starts']):
+        matrix, _ = build_transition_matrix(states[start:start + window], order)
+        assert np.allclose(result['matrices'][w], matrix)
+        assert math.isclose(result['steady'][w].sum(), 1.0)
+        if len(set(states[start:start + window])) == len(order):
+            assert np.allclose(result['steady'][w], list(compute_steady_state(matrix).values()), atol=1e-5)
+
+
+def test_rolling_markov_rejects_window_longer_than_sequence():
+    with pytest.raises(ValueError):
+        rolling_markov(np.zeros(10, dtype=int), 3, window=30)
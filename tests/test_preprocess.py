@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from modules.preprocess import STATE_LABELS, extract_region_sequences, filter_mobility, region_mask
+
+CATEGORY = 'retail_and_recreation_percent_change_from_baseline'
+
+
+def mobility_frame():
+    """National, sub-region and metro rows for one country, in shuffled date order."""
+    rows = [
+        # country, sub_region_1, sub_region_2, metro_area, date, value
+        ('Testland', None, None, None, '2020-03-03', 30),
+        ('Testland', 'North', None, None, '2020-03-02', 30),
+        ('Testland', None, None, None, '2020-03-01', -50),
+        ('Testland', 'North', 'Lakeside', None, '2020-03-01', 0),
+        ('Testland', None, None, 'Capital Metro', '2020-03-01', -50),
+        ('Testland', None, None, None, '2020-03-02', 0),
+        ('Testland', 'North', None, None, '2020-03-01', -50),
+        ('Otherland', None, None, None, '2020-03-01', 30),
+    ]
+    df = pd.DataFrame(rows, columns=['country_region', 'sub_region_1', 'sub_region_2',
+                                     'metro_area', 'date', CATEGORY])
+    df['date'] = pd.to_datetime(df['date'])
+    df['year'] = df['date'].dt.year
+    return df
+
+
+def test_country_alone_selects_only_national_rows():
+    df = mobility_frame()
+
+    national = df[region_mask(df, 'Testland')]
+    assert len(national) == 3
+    assert national[['sub_region_1', 'sub_region_2', 'metro_area']].isna().all().all()
+
+    north = df[region_mask(df, ('Testland', 'North'))]
+    assert len(north) == 2  # Not the Lakeside row below it
+    assert df[region_mask(df, ('Testland', None, None, 'Capital Metro'))].shape[0] == 1
+
+
+def test_filter_mobility_returns_values_in_date_order():
+    values = filter_mobility(mobility_frame(), 'Testland', 2020, CATEGORY)
+    assert values.tolist() == [-50, 0, 30]
+
+
+def test_extract_region_sequences_keys_and_date_order():
+    df = mobility_frame()
+    low, moderate, high = range(len(STATE_LABELS))
+
+    national = extract_region_sequences(df, CATEGORY, 2020)
+    assert list(national) == [('Otherland', None, None, None), ('Testland', None, None, None)]
+    assert np.array_equal(national[('Testland', None, None, None)], [low, moderate, high])
+
+    regions = extract_region_sequences(df, CATEGORY, 2020, level='sub_region_1', countries=['Testland'])
+    assert list(regions) == [('Testland', 'North', None, None)]
+    assert np.array_equal(regions[('Testland', 'North', None, None)], [low, high])